@@ -16,47 +16,70 @@ Telegram bot token'ni muhit o'zgaruvchisiga qo'ying:
 
 import os
 import csv
-import io
+import queue
 import sqlite3
 import hashlib
+import heapq
+import hmac
 import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from functools import wraps
-from flask import Flask, render_template_string, request, redirect, url_for, session, flash, Response
+from flask import Flask, request, redirect, url_for, session, flash, Response, g, has_app_context, stream_with_context
 from dotenv import load_dotenv
+from jinja2 import DictLoader, FileSystemBytecodeCache
+from markupsafe import Markup, escape
 
 # .env faylini o'qish
 load_dotenv()
 
-# Telegram uchun
-import requests as http_requests
+# Telegram uchun (requests birinchi xabar yuborilganda import qilinadi)
 TELEGRAM_AVAILABLE = True
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 # ============== KONFIGURATSIYA ==============
 app = Flask(__name__)
 app.secret_key = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
-# Ensure reminder thread runs when app is served by WSGI servers (e.g. Gunicorn on Railway)
-# Use Flask 3+ compatible hook if available; fall back safely when running older Flask.
-if hasattr(app, 'before_serving'):
-    def _start_reminder_wrapper():
-        start_reminder_thread()
-    app.before_serving(_start_reminder_wrapper)
-elif hasattr(app, 'before_first_request'):
-    def _start_reminder_wrapper():
-        start_reminder_thread()
-    app.before_first_request(_start_reminder_wrapper)
 # Use an absolute path for the SQLite database so Gunicorn and other
 # process working directories don't change where the DB is created.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE = os.path.join(BASE_DIR, 'crm.db')
 
+# Statik fayllar (CSS) brauzerda 1 yil keshlanadi; fayl o'zgarsa ?v= qiymati
+# ham o'zgaradi va brauzer yangi faylni yuklaydi
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000
+with open(os.path.join(app.static_folder, 'app.css'), 'rb') as f:
+    app.jinja_env.globals['STATIC_VERSION'] = hashlib.sha256(f.read()).hexdigest()[:12]
+
+# Shablonlar kod ichida: productionda har renderda yangilanganini tekshirish
+# shart emas. Bytecode cache worker qayta ishga tushganda parse'ni tejaydi.
+if not app.debug:
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    app.jinja_env.auto_reload = False
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
 # O'zbekiston vaqt zonasi (UTC+5)
 UZB_TIMEZONE = timezone(timedelta(hours=5))
 
+def _uzb_now_pair():
+    """(aware, naive) ko'rinishidagi hozirgi vaqt; so'rov ichida g da keshlanadi"""
+    if not has_app_context():
+        now = datetime.now(UZB_TIMEZONE)
+        return now, now.replace(tzinfo=None)
+    if 'uzb_now' not in g:
+        now = datetime.now(UZB_TIMEZONE)
+        g.uzb_now = (now, now.replace(tzinfo=None))
+    return g.uzb_now
+
 def get_uzb_now():
-    """O'zbekiston vaqtini olish"""
-    return datetime.now(UZB_TIMEZONE)
+    """O'zbekiston vaqtini olish (bitta so'rov davomida bir xil qiymat)"""
+    return _uzb_now_pair()[0]
 
 def format_datetime(dt):
     """Datetime'ni 24 soatlik formatda ko'rsatish"""
@@ -66,95 +89,207 @@ def format_datetime(dt):
         dt = dt.replace(tzinfo=UZB_TIMEZONE)
     return dt.strftime('%d.%m.%Y %H:%M')
 
-def is_overdue(deadline):
-    """Muddat o'tganligini tekshirish (timezone-safe)"""
-    if deadline is None:
-        return False
-    now = get_uzb_now()
-    if deadline.tzinfo is None:
-        deadline = deadline.replace(tzinfo=UZB_TIMEZONE)
-    return deadline < now
-
 # Telegram sozlamalari: hozir DB orqali o'qiladi; .env fallback ham mavjud
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
 BOSS_TELEGRAM_CHAT_ID = os.environ.get('BOSS_TELEGRAM_CHAT_ID', '')
+# Birinchi ishga tushirishda boss paroli (bo'sh bo'lsa: 'magistr')
+BOSS_DEFAULT_PASSWORD = os.environ.get('BOSS_DEFAULT_PASSWORD', '')
 
 def get_setting(key):
     """DB dan sozlamani o'qish"""
     try:
-        conn = get_db()
+        conn = get_reader()
         row = conn.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
-        conn.close()
         return row['value'] if row else None
     except Exception:
         return None
 
 def set_setting(key, value):
     """DB ga sozlamani yozish (yangi yoki yangilash)"""
-    conn = get_db()
-    # INSERT OR REPLACE ishlatamiz, shunda mavjud bo'lsa yangilanadi
-    conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, value))
-    conn.commit()
-    conn.close()
+    with get_writer() as conn:
+        # INSERT OR REPLACE ishlatamiz, shunda mavjud bo'lsa yangilanadi
+        conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, value))
 
 # SQLite datetime adapterlari (Python 3.12+ uchun)
 sqlite3.register_adapter(datetime, lambda d: d.isoformat())
 sqlite3.register_converter("DATETIME", lambda s: datetime.fromisoformat(s.decode()) if s else None)
 
+# ============== PAROLLAR ==============
+# scrypt parametrlari: n=2**14, r=8 taxminan 16 MB xotira talab qiladi
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_SIZE = 16
+SCRYPT_PREFIX = 'scrypt$'
+# 'magistr' uchun oldindan hisoblangan xesh (default boss paroli, har startda scrypt chaqirilmaydi)
+DEFAULT_BOSS_PASSWORD_HASH = 'scrypt$64dceeeb212ecfec480810902ffc71ff84514bfb555a22a9d1595ece0c243b6e2c3cd07ab340556a17fbb495f80c195fbaf0ba3527d6e64db12e02fcb401a54db189dd0c3800b60658ceba141eca6c20'
+
+def _scrypt(password, salt):
+    return hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+
+def hash_password(password):
+    """Parolni tasodifiy salt bilan scrypt orqali xeshlash ("scrypt$" + hex(salt||hash))"""
+    salt = os.urandom(SALT_SIZE)
+    return SCRYPT_PREFIX + (salt + _scrypt(password, salt)).hex()
+
+def is_legacy_hash(stored):
+    """Eski (saltsiz SHA-256) formatdagi xeshmi"""
+    return not stored.startswith(SCRYPT_PREFIX)
+
+def verify_password(stored, password):
+    """Parolni saqlangan xesh bilan constant-time solishtirish"""
+    if not stored:
+        return False
+    if is_legacy_hash(stored):
+        # Eski foydalanuvchilar: kirganda scrypt ga o'tkaziladi (login ga qarang)
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    raw = bytes.fromhex(stored[len(SCRYPT_PREFIX):])
+    salt, expected = raw[:SALT_SIZE], raw[SALT_SIZE:]
+    return hmac.compare_digest(_scrypt(password, salt), expected)
+
 # ============== BAZANI SOZLASH ==============
-def get_db():
-    """Ma'lumotlar bazasiga ulanish"""
-    conn = sqlite3.connect(DATABASE, detect_types=sqlite3.PARSE_DECLTYPES)
+# Ulanishlar pool'i: bitta yozuvchi + READER_POOL_SIZE ta o'quvchi ulanish.
+# Har so'rovda faylni qayta ochmaslik uchun ulanishlar qayta ishlatiladi.
+READER_POOL_SIZE = 8
+_readers = queue.Queue(maxsize=READER_POOL_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+_thread_local = threading.local()
+
+def _connect():
+    """Ma'lumotlar bazasiga yangi ulanish ochish"""
+    # check_same_thread=False: pool'dagi ulanish turli so'rov threadlarida ishlatiladi.
+    # isolation_level=None: tranzaksiyalarni faqat immediate_transaction() ochadi;
+    # cached_statements: uzoq yashovchi ulanishda takroriy so'rovlar qayta parse qilinmaydi
+    conn = sqlite3.connect(
+        DATABASE, detect_types=sqlite3.PARSE_DECLTYPES, timeout=5.0, check_same_thread=False,
+        isolation_level=None, cached_statements=256,
+    )
     conn.row_factory = sqlite3.Row
+    # Lock bo'lsa darhol xato bermasdan 5 soniyagacha kutish
+    conn.execute('PRAGMA busy_timeout=5000')
+    # Quyidagilar faqat shu ulanish uchun amal qiladi (bazada saqlanmaydi)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')
+    # Bazani xotiraga map qilish: o'qishlarda read() syscall yo'q (256 MB gacha)
+    conn.execute('PRAGMA mmap_size=268435456')
     return conn
 
+@contextmanager
+def immediate_transaction(conn):
+    """Yozish lock'ini oldindan olib tranzaksiya ochish (BEGIN IMMEDIATE)"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+def get_reader():
+    """O'qish uchun ulanish (so'rov davomida bitta, keyin pool'ga qaytadi)"""
+    if not has_app_context():
+        # Reminder kabi fon threadlari o'z ulanishini saqlab qoladi
+        conn = getattr(_thread_local, 'reader', None)
+        if conn is None:
+            conn = _thread_local.reader = _connect()
+        return conn
+    if 'db_reader' not in g:
+        try:
+            g.db_reader = _readers.get_nowait()
+        except queue.Empty:
+            g.db_reader = _connect()
+    return g.db_reader
+
+@app.teardown_appcontext
+def release_reader(exc):
+    """So'rov tugagach o'quvchi ulanishni pool'ga qaytarish"""
+    conn = g.pop('db_reader', None)
+    if conn is None:
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _readers.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+@contextmanager
+def get_writer():
+    """Yagona yozuvchi ulanish ustida BEGIN IMMEDIATE tranzaksiya"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _connect()
+        with immediate_transaction(_writer):
+            yield _writer
+
+# Jadvallar (init_db da indekslar bilan bitta tranzaksiyada bajariladi)
+SCHEMA_SQL = '''
+-- Users jadvali
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL CHECK(role IN ('boss', 'xodim')),
+    full_name TEXT,
+    telegram_chat_id TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tasks jadvali
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT,
+    assigned_to INTEGER,
+    deadline DATETIME,
+    status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'completed')),
+    completion_note TEXT,
+    completed_at DATETIME,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    reminder_2h_sent INTEGER DEFAULT 0,
+    reminder_30m_sent INTEGER DEFAULT 0,
+    reminder_5m_sent INTEGER DEFAULT 0,
+    FOREIGN KEY (assigned_to) REFERENCES users(id)
+);
+
+-- Settings jadvali: Telegram token va boss chat id kabi konfiguratsiyalar uchun
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+# Indekslar har ishga tushishda ham tekshiriladi (ensure_indexes): mavjud
+# bazalar ham yangi indekslarni oladi
+INDEX_SQL = '''
+-- Dashboard statistikasi uchun (status bo'yicha guruhlash + muddat)
+CREATE INDEX IF NOT EXISTS idx_tasks_status_deadline ON tasks(status, deadline);
+-- Reminder tekshiruvi faqat bajarilmagan topshiriqlarni ko'radi (partial index)
+CREATE INDEX IF NOT EXISTS idx_tasks_pending_deadline ON tasks(deadline) WHERE status = 'pending';
+-- Xodim dashboardi va "Mening topshiriqlarim": assigned_to + status + muddat
+-- bitta indeks oralig'idan o'qiladi (assigned_to bo'yicha qidiruvni ham qoplaydi)
+CREATE INDEX IF NOT EXISTS idx_tasks_assigned_status_deadline ON tasks(assigned_to, status, deadline);
+
+-- Eski versiyadagi indeks: idx_tasks_assigned_status_deadline uni qoplaydi
+DROP INDEX IF EXISTS idx_tasks_assigned;
+'''
+
 def init_db():
     """Bazani yaratish va boshlang'ich ma'lumotlarni qo'shish"""
-    conn = get_db()
+    conn = _connect()
+    # WAL rejimi bazada saqlanadi: o'quvchilar (dashboard) yozuvchi
+    # (reminder thread) bilan bir vaqtda ishlay oladi
+    conn.execute('PRAGMA journal_mode=WAL')
+    # Sxema va boshlang'ich ma'lumotlar bitta tranzaksiyada yoziladi (bitta fsync)
+    conn.executescript('BEGIN IMMEDIATE;' + SCHEMA_SQL + INDEX_SQL)
     cursor = conn.cursor()
     
-    # Users jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('boss', 'xodim')),
-            full_name TEXT,
-            telegram_chat_id TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Tasks jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            assigned_to INTEGER,
-            deadline DATETIME,
-            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'completed')),
-            completion_note TEXT,
-            completed_at DATETIME,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            reminder_2h_sent INTEGER DEFAULT 0,
-            reminder_30m_sent INTEGER DEFAULT 0,
-            reminder_5m_sent INTEGER DEFAULT 0,
-            FOREIGN KEY (assigned_to) REFERENCES users(id)
-        )
-    ''')
-    
-    # Settings jadvali: Telegram token va boss chat id kabi konfiguratsiyalar uchun
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    ''')
-    
-    # Default boss foydalanuvchisini qo'shish
-    hashed_password = hashlib.sha256('magistr'.encode()).hexdigest()
+    # Default boss foydalanuvchisini qo'shish (BOSS_DEFAULT_PASSWORD bo'lsa o'sha parol bilan)
+    hashed_password = hash_password(BOSS_DEFAULT_PASSWORD) if BOSS_DEFAULT_PASSWORD else DEFAULT_BOSS_PASSWORD_HASH
     cursor.execute('''
         INSERT OR IGNORE INTO users (username, password, role, full_name)
         VALUES (?, ?, ?, ?)
@@ -170,25 +305,157 @@ def init_db():
         print(f"Init settings error: {e}")
     
     conn.commit()
+    # Query planner indeks tanlashi uchun statistika
+    conn.execute('ANALYZE')
     conn.close()
 
+def ensure_indexes():
+    """Mavjud bazada indekslarni yaratish va planner statistikasini yangilash"""
+    conn = _connect()
+    try:
+        conn.executescript('BEGIN IMMEDIATE;' + INDEX_SQL + 'COMMIT;')
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+
 # Ensure the database exists when the module is imported (e.g. when
 # running under Gunicorn). This creates tables if the DB file is
-# missing. It's safe to call multiple times because CREATE TABLE IF
-# NOT EXISTS is used.
-if not os.path.exists(DATABASE):
+# missing; an existing DB still gets any indexes it lacks. It's safe to
+# call multiple times because IF NOT EXISTS is used. The file lock keeps
+# several workers starting at once from racing on a half-created database.
+with open(DATABASE + '.init.lock', 'w') as _init_lock:
+    if fcntl is not None:
+        fcntl.flock(_init_lock, fcntl.LOCK_EX)
     try:
-        init_db()
+        if not os.path.exists(DATABASE):
+            init_db()
+        else:
+            ensure_indexes()
     except Exception as e:
         print(f"Failed to initialize DB on import: {e}")
 
-# ============== TELEGRAM FUNKSIYALARI ==============
-def send_telegram_message(chat_id, message):
-    """Telegram orqali xabar yuborish"""
-    token = get_setting('TELEGRAM_BOT_TOKEN') or TELEGRAM_BOT_TOKEN
-    if not token or not chat_id or not TELEGRAM_AVAILABLE:
-        return False
+# Topshiriq formalaridagi xodimlar ro'yxati kamdan-kam o'zgaradi: worker ichida
+# saqlanadi va settings dagi data_version bilan tekshiriladi. Uni har bir users
+# yozuvi o'sha tranzaksiyada oshiradi, shuning uchun boshqa Gunicorn workerida
+# qilingan o'zgarish ham darhol ko'rinadi (bitta PRIMARY KEY qidiruvi)
+_users_cache = {'data': None, 'version': None}
+_users_cache_lock = threading.Lock()
+
+def get_users_cached():
+    """Barcha foydalanuvchilar (boss ham, xodim ham) - keshdan"""
+    conn = get_reader()
+    row = conn.execute("SELECT value FROM settings WHERE key = 'data_version'").fetchone()
+    version = row['value'] if row else None
+    with _users_cache_lock:
+        if _users_cache['data'] is not None and _users_cache['version'] == version:
+            return _users_cache['data']
+    # Versiya ro'yxatdan oldin o'qiladi: oradagi yozuv keyingi chaqiruvda yangilanadi
+    users = conn.execute('SELECT * FROM users ORDER BY role DESC, full_name').fetchall()
+    with _users_cache_lock:
+        _users_cache.update(data=users, version=version)
+    return users
+
+# Dashboard statistikasi worker ichida keshlanadi: kalit - xodim id (boss uchun None).
+# Muddati o'tganlar soni vaqt bilan o'zgaradi, shuning uchun TTL qisqa.
+DASHBOARD_CACHE_TTL = 30
+_dashboard_cache = {'entries': {}, 'gen': 0}
+_dashboard_cache_lock = threading.Lock()
+
+def get_dashboard_stats(user_id=None):
+    """Topshiriqlar statistikasi (bitta so'rov, jadval bir marta o'qiladi) - keshdan"""
+    with _dashboard_cache_lock:
+        cached = _dashboard_cache['entries'].get(user_id)
+        if cached is not None and time.monotonic() - cached[0] < DASHBOARD_CACHE_TTL:
+            return cached[1]
+        gen = _dashboard_cache['gen']
+    query = '''
+        SELECT COUNT(*) AS total,
+               SUM(status = 'completed') AS completed,
+               SUM(status = 'pending') AS pending,
+               SUM(status = 'pending' AND deadline < ?) AS overdue
+        FROM tasks
+    '''
+    params = [get_uzb_now()]
+    if user_id is not None:
+        query += ' WHERE assigned_to = ?'
+        params.append(user_id)
+    row = get_reader().execute(query, params).fetchone()
+    # Topshiriq bo'lmasa SUM() NULL qaytaradi
+    stats = {key: row[key] or 0 for key in ('total', 'completed', 'pending', 'overdue')}
+    with _dashboard_cache_lock:
+        if _dashboard_cache['gen'] == gen:
+            _dashboard_cache['entries'][user_id] = (time.monotonic(), stats)
+    return stats
+
+def invalidate_dashboard_cache():
+    """tasks jadvali o'zgargandan keyin chaqiriladi"""
+    with _dashboard_cache_lock:
+        _dashboard_cache['entries'] = {}
+        _dashboard_cache['gen'] += 1
+
+def bump_data_version(conn):
+    """Ro'yxat sahifalaridagi ma'lumot o'zgardi: ETag'lar eskiradi (writer tranzaksiyasi ichida)"""
+    conn.execute(
+        "INSERT INTO settings (key, value) VALUES ('data_version', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
 
+# ============== TELEGRAM FUNKSIYALARI ==============
+class TokenBucket:
+    """Soniyasiga `rate` ta so'rovga ruxsat beruvchi token bucket (thread-safe)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bitta token olish; token bo'lmasa yangisi paydo bo'lguncha kutish"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Telegram API ~30 xabar/soniyadan ko'pida 429 qaytaradi, shuning uchun 25/s
+_tg_bucket = TokenBucket(rate=25, capacity=25)
+# 429 javobidagi retry_after bundan uzun bo'lsa ham shuncha kutiladi (soniya)
+TELEGRAM_MAX_RETRY_AFTER = 30
+# Bitta xabar uchun jami POST urinishlari (429/502/503 bo'lsa qayta yuboriladi)
+TELEGRAM_MAX_ATTEMPTS = 3
+TELEGRAM_RETRY_STATUSES = frozenset({429, 502, 503})
+# Bitta Session: api.telegram.org bilan TCP/TLS ulanish qayta ishlatiladi (keep-alive)
+_tg_session = None
+_tg_session_lock = threading.Lock()
+_tg_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='telegram')
+
+def _get_tg_session():
+    """requests.Session ni birinchi chaqiruvda yaratish (import ham shu yerda)"""
+    global _tg_session
+    if _tg_session is None:
+        with _tg_session_lock:
+            if _tg_session is None:
+                import requests as http_requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                # Adapter faqat ulanish xatolarini qayta urinadi: so'rov hali yuborilmagan.
+                # Read timeout qayta yuborilmaydi (Telegram qabul qilgan bo'lishi mumkin,
+                # xabar ikki marta boradi); status bo'yicha urinishlar _do_send() da.
+                retry = Retry(total=None, connect=2, read=0, status=0, other=0, backoff_factor=0.5)
+                tg_session = http_requests.Session()
+                tg_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+                _tg_session = tg_session
+    return _tg_session
+
+def _do_send(token, chat_id, message):
+    """Xabarni Telegram API ga yuborish (pool threadida ishlaydi)"""
     try:
         url = f"https://api.telegram.org/bot{token}/sendMessage"
         data = {
@@ -196,17 +463,39 @@ def send_telegram_message(chat_id, message):
             'text': message,
             'parse_mode': 'HTML'
         }
-        response = http_requests.post(url, data=data, timeout=10)
+        for attempt in range(1, TELEGRAM_MAX_ATTEMPTS + 1):
+            # Har bir urinish (qayta yuborish ham) rate limit orqali o'tadi
+            _tg_bucket.acquire()
+            response = _get_tg_session().post(url, data=data, timeout=10)
+            if response.status_code not in TELEGRAM_RETRY_STATUSES or attempt == TELEGRAM_MAX_ATTEMPTS:
+                break
+            if response.status_code == 429:
+                # Telegram kutish vaqtini JSON ichida beradi: parameters.retry_after
+                try:
+                    wait = float(response.json().get('parameters', {}).get('retry_after', 1))
+                except ValueError:
+                    wait = 1
+            else:
+                wait = 0.5 * 2 ** (attempt - 1)
+            time.sleep(min(wait, TELEGRAM_MAX_RETRY_AFTER))
         return response.status_code == 200
     except Exception as e:
         print(f"Telegram xato: {e}")
         return False
 
+def send_telegram_message(chat_id, message):
+    """Telegram orqali xabar yuborish (fonda; natija Future[bool] ko'rinishida)"""
+    token = get_setting('TELEGRAM_BOT_TOKEN') or TELEGRAM_BOT_TOKEN
+    if not token or not chat_id or not TELEGRAM_AVAILABLE:
+        future = Future()
+        future.set_result(False)
+        return future
+    return _tg_pool.submit(_do_send, token, chat_id, message)
+
 def notify_user_new_task(user_id, task_title, deadline=None):
     """Yangi topshiriq haqida xodimga xabar"""
-    conn = get_db()
+    conn = get_reader()
     user = conn.execute('SELECT telegram_chat_id, full_name FROM users WHERE id = ?', (user_id,)).fetchone()
-    conn.close()
     
     if user and user['telegram_chat_id']:
         deadline_text = f"\n📅 Muddat: {deadline.strftime('%d.%m.%Y %H:%M')}" if deadline else ""
@@ -219,87 +508,213 @@ def notify_boss_task_completed(task_id):
     if not boss_id:
         return
     
-    conn = get_db()
+    conn = get_reader()
     task = conn.execute('''
-        SELECT t.*, u.full_name as xodim_name 
+        SELECT t.title, t.completion_note, u.full_name as xodim_name 
         FROM tasks t 
         LEFT JOIN users u ON t.assigned_to = u.id 
         WHERE t.id = ?
     ''', (task_id,)).fetchone()
-    conn.close()
     
     if task:
-        message = f"✅ <b>Topshiriq bajarildi!</b>\n\n"
-        message += f"📋 {task['title']}\n"
-        message += f"👤 Bajardi: {task['xodim_name'] or 'Noma\'lum'}\n"
-        if task['completion_note']:
-            message += f"💬 Izoh: {task['completion_note']}"
+        xodim_name = task['xodim_name'] or "Noma'lum"
+        note = f"💬 Izoh: {task['completion_note']}" if task['completion_note'] else ''
+        message = f"✅ <b>Topshiriq bajarildi!</b>\n\n📋 {task['title']}\n👤 Bajardi: {xodim_name}\n{note}"
         send_telegram_message(boss_id, message)
 
 # ============== REMINDER TIZIMI ==============
-reminder_thread_started = False
+# Event.is_set() lock'siz o'qiladi; lock faqat birinchi ishga tushirishda kerak
+reminder_thread_started = threading.Event()
 reminder_lock = threading.Lock()
 
+# Eslatma turlari: (nomi, flag ustuni, muddatdan necha daqiqa oldin, +/- oyna daqiqada)
+REMINDER_KINDS = (
+    ('2h', 'reminder_2h_sent', 120, 5),
+    ('30m', 'reminder_30m_sent', 30, 5),
+    ('5m', 'reminder_5m_sent', 5, 2),
+)
+REMINDER_BY_KIND = {kind: (column, minutes, window) for kind, column, minutes, window in REMINDER_KINDS}
+
+# Eslatma xabarlari shablonlari
+MSG_2H = "⏰ <b>Eslatma!</b>\n\n📋 {title}\n⏳ Muddat: 2 soatdan kam qoldi!"
+MSG_30M = "⚠️ <b>Shoshiling!</b>\n\n📋 {title}\n⏳ Muddat: 30 daqiqadan kam qoldi!"
+MSG_5M = "🚨 <b>DIQQAT!</b>\n\n📋 {title}\n⏳ Muddat: 5 daqiqadan kam qoldi!"
+REMINDER_MESSAGES = {'2h': MSG_2H, '30m': MSG_30M, '5m': MSG_5M}
+# Boshqa jarayonlarda (Gunicorn worker) qo'shilgan topshiriqlarni ham ko'rish uchun
+# navbat shu oraliqda bazadan to'ldiriladi
+REMINDER_RESYNC_SECONDS = 60
+
+# (vaqt, task_id, tur) ko'rinishidagi min-heap; eng yaqin eslatma boshida turadi
+_reminder_heap = []
+# (task_id, tur) -> vaqt: deadline o'zgargach heap'dagi eski yozuvlarni o'tkazib yuborish uchun
+_reminder_due = {}
+_reminder_cond = threading.Condition()
+# Telegram pool'ida yuborilayotgan (task_id, tur) juftliklari
+_reminders_in_flight = set()
+_reminders_in_flight_lock = threading.Lock()
+
+def schedule_reminders(task_id, deadline, sent=()):
+    """Topshiriq eslatmalarini navbatga qo'yish (sent - yuborilgan flag ustunlari)"""
+    # Navbatni faqat reminder thread ishlayotgan worker bo'shatadi; boshqa
+    # workerlarda heap cheksiz o'sardi. Ularning topshiriqlarini 60 soniyalik
+    # resync bazadan o'zi oladi
+    if not reminder_thread_started.is_set():
+        return
+    _queue_reminders(task_id, deadline, sent)
+
+def _queue_reminders(task_id, deadline, sent=()):
+    """Eslatmalarni heap'ga yozish (tekshiruvsiz; resync ham shuni ishlatadi)"""
+    if deadline is None:
+        return
+    if deadline.tzinfo is None:
+        deadline = deadline.replace(tzinfo=UZB_TIMEZONE)
+    deadline_ts = deadline.timestamp()
+    now_ts = time.time()
+    with _reminder_cond:
+        for kind, column, minutes, window in REMINDER_KINDS:
+            due_ts = deadline_ts - minutes * 60
+            if column in sent or due_ts + window * 60 < now_ts:
+                continue
+            key = (task_id, kind)
+            if _reminder_due.get(key) == due_ts:
+                continue
+            _reminder_due[key] = due_ts
+            heapq.heappush(_reminder_heap, (due_ts, task_id, kind))
+        _reminder_cond.notify()
+
+def _load_upcoming_reminders():
+    """Yaqin orada eslatmasi bor topshiriqlarni bazadan navbatga yuklash"""
+    now = get_uzb_now().replace(tzinfo=None)
+    horizon = now + timedelta(minutes=max(m + w for _, _, m, w in REMINDER_KINDS), seconds=REMINDER_RESYNC_SECONDS)
+    tasks = get_reader().execute('''
+        SELECT id, deadline, reminder_2h_sent, reminder_30m_sent, reminder_5m_sent
+        FROM tasks
+        WHERE status = 'pending' AND deadline > ? AND deadline <= ?
+    ''', (now, horizon)).fetchall()
+    for task in tasks:
+        sent = {column for _, column, _, _ in REMINDER_KINDS if task[column]}
+        _queue_reminders(task['id'], task['deadline'], sent)
+
+def _pop_due_reminders(now_ts):
+    """Vaqti kelgan (task_id, tur) juftliklarini heap'dan olish"""
+    due = []
+    while _reminder_heap and _reminder_heap[0][0] <= now_ts:
+        due_ts, task_id, kind = heapq.heappop(_reminder_heap)
+        if _reminder_due.get((task_id, kind)) != due_ts:
+            continue
+        del _reminder_due[(task_id, kind)]
+        due.append((task_id, kind))
+    return due
+
+def _flag_sent_reminders(pending):
+    """Barcha xabarlar yuborilgach muvaffaqiyatlilarining flaglarini bitta tranzaksiyada yozish"""
+    remaining = [len(pending)]
+    remaining_lock = threading.Lock()
+    
+    def on_done(_future):
+        # Oxirgi tugagan xabarning callback'i (Telegram pool threadida) yozadi
+        with remaining_lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            sent = {column: [] for _, column, _, _ in REMINDER_KINDS}
+            for (task_id, _), column, future in pending:
+                if future.result():
+                    sent[column].append((task_id,))
+            if any(sent.values()):
+                with get_writer() as writer:
+                    for column, ids in sent.items():
+                        if ids:
+                            writer.executemany(f'UPDATE tasks SET {column} = 1 WHERE id = ?', ids)
+        except Exception as e:
+            print(f"Reminder xato: {e}")
+        finally:
+            with _reminders_in_flight_lock:
+                _reminders_in_flight.difference_update(key for key, _, _ in pending)
+    
+    for _, _, future in pending:
+        future.add_done_callback(on_done)
+
+def _send_due_reminders(due):
+    """Vaqti kelgan eslatmalarni yuborishga navbatga qo'yish (javobni kutmasdan)"""
+    task_ids = sorted({task_id for task_id, _ in due})
+    placeholders = ', '.join('?' * len(task_ids))
+    # Navbatdagi yozuv eskirgan bo'lishi mumkin: holat va deadline bazadan qayta o'qiladi
+    rows = get_reader().execute(f'''
+        SELECT t.id, t.title, t.deadline, u.telegram_chat_id,
+               t.reminder_2h_sent, t.reminder_30m_sent, t.reminder_5m_sent
+        FROM tasks t
+        LEFT JOIN users u ON t.assigned_to = u.id
+        WHERE t.status = 'pending' AND t.id IN ({placeholders})
+    ''', task_ids).fetchall()
+    tasks = {task['id']: task for task in rows}
+    now = get_uzb_now()
+    
+    pending = []
+    for task_id, kind in due:
+        task = tasks.get(task_id)
+        if not task or not task['deadline'] or not task['telegram_chat_id']:
+            continue
+        column, minutes, window = REMINDER_BY_KIND[kind]
+        if task[column]:
+            continue
+        
+        # Deadline'ni O'zbekiston vaqt zonasiga o'tkazish
+        deadline = task['deadline']
+        if deadline.tzinfo is None:
+            deadline = deadline.replace(tzinfo=UZB_TIMEZONE)
+        minutes_left = (deadline - now).total_seconds() / 60
+        if not minutes - window <= minutes_left <= minutes + window:
+            continue
+        
+        # Hali yuborilayotgan eslatma resync orqali qayta navbatga tushsa, ikki marta yuborilmaydi
+        key = (task_id, kind)
+        with _reminders_in_flight_lock:
+            if key in _reminders_in_flight:
+                continue
+            _reminders_in_flight.add(key)
+        pending.append((key, column, send_telegram_message(task['telegram_chat_id'], REMINDER_MESSAGES[kind].format(title=task['title']))))
+    
+    # Reminder thread HTTP javobini kutmaydi: flaglar callback orqali yoziladi
+    if pending:
+        _flag_sent_reminders(pending)
+
 def check_reminders():
-    """Muddat yaqinlashgan topshiriqlarni tekshirish"""
+    """Muddat yaqinlashgan topshiriqlarni navbat (heap) bo'yicha yuborish"""
+    next_resync = 0
     while True:
         try:
-            conn = get_db()
-            now = get_uzb_now()
-            
-            # Bajarilmagan va muddati bor topshiriqlarni olish
-            tasks = conn.execute('''
-                SELECT t.*, u.telegram_chat_id, u.full_name
-                FROM tasks t
-                LEFT JOIN users u ON t.assigned_to = u.id
-                WHERE t.status = 'pending' AND t.deadline IS NOT NULL
-            ''').fetchall()
+            if time.time() >= next_resync:
+                _load_upcoming_reminders()
+                next_resync = time.time() + REMINDER_RESYNC_SECONDS
             
-            for task in tasks:
-                if not task['deadline'] or not task['telegram_chat_id']:
+            with _reminder_cond:
+                due = _pop_due_reminders(time.time())
+                if not due:
+                    # Keyingi eslatma yoki resync vaqtigacha uxlash (schedule_reminders uyg'otadi)
+                    wake_at = next_resync
+                    if _reminder_heap:
+                        wake_at = min(wake_at, _reminder_heap[0][0])
+                    _reminder_cond.wait(timeout=max(wake_at - time.time(), 0))
                     continue
-                
-                # Deadline'ni O'zbekiston vaqt zonasiga o'tkazish
-                deadline = task['deadline']
-                if deadline.tzinfo is None:
-                    deadline = deadline.replace(tzinfo=UZB_TIMEZONE)
-                
-                time_left = deadline - now
-                minutes_left = time_left.total_seconds() / 60
-                
-                # 2 soat oldin (120 daqiqa)
-                if 115 <= minutes_left <= 125 and not task['reminder_2h_sent']:
-                    message = f"⏰ <b>Eslatma!</b>\n\n📋 {task['title']}\n⏳ Muddat: 2 soatdan kam qoldi!"
-                    if send_telegram_message(task['telegram_chat_id'], message):
-                        conn.execute('UPDATE tasks SET reminder_2h_sent = 1 WHERE id = ?', (task['id'],))
-                
-                # 30 daqiqa oldin
-                elif 25 <= minutes_left <= 35 and not task['reminder_30m_sent']:
-                    message = f"⚠️ <b>Shoshiling!</b>\n\n📋 {task['title']}\n⏳ Muddat: 30 daqiqadan kam qoldi!"
-                    if send_telegram_message(task['telegram_chat_id'], message):
-                        conn.execute('UPDATE tasks SET reminder_30m_sent = 1 WHERE id = ?', (task['id'],))
-                
-                # 5 daqiqa oldin
-                elif 3 <= minutes_left <= 7 and not task['reminder_5m_sent']:
-                    message = f"🚨 <b>DIQQAT!</b>\n\n📋 {task['title']}\n⏳ Muddat: 5 daqiqadan kam qoldi!"
-                    if send_telegram_message(task['telegram_chat_id'], message):
-                        conn.execute('UPDATE tasks SET reminder_5m_sent = 1 WHERE id = ?', (task['id'],))
             
-            conn.commit()
-            conn.close()
+            _send_due_reminders(due)
         except Exception as e:
             print(f"Reminder xato: {e}")
-        
-        time.sleep(60)  # Har daqiqada tekshirish
+            time.sleep(REMINDER_RESYNC_SECONDS)
 
+# Gunicorn ostida gunicorn.conf.py dagi post_fork hook chaqiradi (faqat bitta
+# workerda, fayl lock orqali); `python app.py` da pastdagi __main__ blokida
 def start_reminder_thread():
     """Reminder threadni boshlash (bir marta)"""
-    global reminder_thread_started
+    if reminder_thread_started.is_set():
+        return
     with reminder_lock:
-        if not reminder_thread_started:
+        if not reminder_thread_started.is_set():
             thread = threading.Thread(target=check_reminders, daemon=True)
             thread.start()
-            reminder_thread_started = True
+            reminder_thread_started.set()
 
 # ============== AUTENTIFIKATSIYA ==============
 def login_required(f):
@@ -323,381 +738,6 @@ def boss_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# ============== CSS STILLARI ==============
-CSS_STYLES = '''
-<style>
-    * {
-        margin: 0;
-        padding: 0;
-        box-sizing: border-box;
-    }
-    
-    body {
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        min-height: 100vh;
-        padding: 20px;
-    }
-    
-    .container {
-        max-width: 1200px;
-        margin: 0 auto;
-    }
-    
-    .card {
-        background: white;
-        border-radius: 16px;
-        box-shadow: 0 10px 40px rgba(0,0,0,0.2);
-        padding: 30px;
-        margin-bottom: 20px;
-    }
-    
-    .card-header {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-bottom: 25px;
-        padding-bottom: 15px;
-        border-bottom: 2px solid #f0f0f0;
-    }
-    
-    h1, h2, h3 {
-        color: #333;
-    }
-    
-    h1 {
-        font-size: 28px;
-        background: linear-gradient(135deg, #667eea, #764ba2);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-    }
-    
-    .btn {
-        padding: 12px 24px;
-        border: none;
-        border-radius: 8px;
-        cursor: pointer;
-        font-size: 14px;
-        font-weight: 600;
-        text-decoration: none;
-        display: inline-block;
-        transition: all 0.3s ease;
-    }
-    
-    .btn-primary {
-        background: linear-gradient(135deg, #667eea, #764ba2);
-        color: white;
-    }
-    
-    .btn-primary:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 5px 20px rgba(102, 126, 234, 0.4);
-    }
-    
-    .btn-success {
-        background: linear-gradient(135deg, #11998e, #38ef7d);
-        color: white;
-    }
-    
-    .btn-success:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 5px 20px rgba(17, 153, 142, 0.4);
-    }
-    
-    .btn-danger {
-        background: linear-gradient(135deg, #eb3349, #f45c43);
-        color: white;
-    }
-    
-    .btn-danger:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 5px 20px rgba(235, 51, 73, 0.4);
-    }
-    
-    .btn-secondary {
-        background: #6c757d;
-        color: white;
-    }
-    
-    .btn-sm {
-        padding: 8px 16px;
-        font-size: 12px;
-    }
-    
-    .form-group {
-        margin-bottom: 20px;
-    }
-    
-    .form-group label {
-        display: block;
-        margin-bottom: 8px;
-        font-weight: 600;
-        color: #555;
-    }
-    
-    .form-control {
-        width: 100%;
-        padding: 12px 16px;
-        border: 2px solid #e0e0e0;
-        border-radius: 8px;
-        font-size: 14px;
-        transition: border-color 0.3s ease;
-    }
-    
-    .form-control:focus {
-        outline: none;
-        border-color: #667eea;
-    }
-    
-    select.form-control {
-        appearance: none;
-        background: url("data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='12' height='12' viewBox='0 0 12 12'%3E%3Cpath fill='%23333' d='M6 8L1 3h10z'/%3E%3C/svg%3E") no-repeat right 12px center;
-        background-color: white;
-    }
-    
-    textarea.form-control {
-        resize: vertical;
-        min-height: 100px;
-    }
-    
-    .table-container {
-        overflow-x: auto;
-    }
-    
-    table {
-        width: 100%;
-        border-collapse: collapse;
-    }
-    
-    th, td {
-        padding: 15px;
-        text-align: left;
-        border-bottom: 1px solid #f0f0f0;
-    }
-    
-    th {
-        background: linear-gradient(135deg, #667eea, #764ba2);
-        color: white;
-        font-weight: 600;
-    }
-    
-    tr:hover {
-        background: #f8f9fa;
-    }
-    
-    .badge {
-        padding: 6px 12px;
-        border-radius: 20px;
-        font-size: 12px;
-        font-weight: 600;
-    }
-    
-    .badge-pending {
-        background: #fff3cd;
-        color: #856404;
-    }
-    
-    .badge-completed {
-        background: #d4edda;
-        color: #155724;
-    }
-    
-    .badge-overdue {
-        background: #f8d7da;
-        color: #721c24;
-    }
-    
-    .badge-boss {
-        background: linear-gradient(135deg, #667eea, #764ba2);
-        color: white;
-    }
-    
-    .badge-xodim {
-        background: linear-gradient(135deg, #11998e, #38ef7d);
-        color: white;
-    }
-    
-    .alert {
-        padding: 15px 20px;
-        border-radius: 8px;
-        margin-bottom: 20px;
-        font-weight: 500;
-    }
-    
-    .alert-success {
-        background: #d4edda;
-        color: #155724;
-        border-left: 4px solid #28a745;
-    }
-    
-    .alert-warning {
-        background: #fff3cd;
-        color: #856404;
-        border-left: 4px solid #ffc107;
-    }
-    
-    .alert-error {
-        background: #f8d7da;
-        color: #721c24;
-        border-left: 4px solid #dc3545;
-    }
-    
-    .alert-info {
-        background: #cce5ff;
-        color: #004085;
-        border-left: 4px solid #007bff;
-    }
-    
-    .nav {
-        display: flex;
-        gap: 15px;
-        align-items: center;
-        flex-wrap: wrap;
-    }
-    
-    .nav a {
-        color: #667eea;
-        text-decoration: none;
-        font-weight: 500;
-        padding: 8px 16px;
-        border-radius: 8px;
-        transition: all 0.3s ease;
-    }
-    
-    .nav a:hover {
-        background: #f0f0f0;
-    }
-    
-    .user-info {
-        display: flex;
-        align-items: center;
-        gap: 10px;
-    }
-    
-    .user-avatar {
-        width: 40px;
-        height: 40px;
-        border-radius: 50%;
-        background: linear-gradient(135deg, #667eea, #764ba2);
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        color: white;
-        font-weight: bold;
-    }
-    
-    .login-container {
-        max-width: 400px;
-        margin: 50px auto;
-    }
-    
-    .login-logo {
-        text-align: center;
-        margin-bottom: 30px;
-    }
-    
-    .login-logo h1 {
-        font-size: 36px;
-        margin-bottom: 10px;
-    }
-    
-    .login-logo p {
-        color: #666;
-    }
-    
-    .grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-        gap: 20px;
-    }
-    
-    .stat-card {
-        background: linear-gradient(135deg, #667eea, #764ba2);
-        color: white;
-        padding: 25px;
-        border-radius: 12px;
-        text-align: center;
-    }
-    
-    .stat-card h3 {
-        font-size: 36px;
-        color: white;
-        margin-bottom: 10px;
-    }
-    
-    .stat-card p {
-        opacity: 0.9;
-    }
-    
-    .filter-form {
-        display: flex;
-        gap: 15px;
-        flex-wrap: wrap;
-        align-items: flex-end;
-        margin-bottom: 20px;
-    }
-    
-    .filter-form .form-group {
-        margin-bottom: 0;
-        flex: 1;
-        min-width: 150px;
-    }
-    
-    .modal-backdrop {
-        display: none;
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: rgba(0,0,0,0.5);
-        z-index: 1000;
-        align-items: center;
-        justify-content: center;
-    }
-    
-    .modal-backdrop.active {
-        display: flex;
-    }
-    
-    .modal {
-        background: white;
-        border-radius: 16px;
-        padding: 30px;
-        max-width: 500px;
-        width: 90%;
-        max-height: 90vh;
-        overflow-y: auto;
-    }
-    
-    .actions {
-        display: flex;
-        gap: 10px;
-    }
-    
-    @media (max-width: 768px) {
-        .card-header {
-            flex-direction: column;
-            gap: 15px;
-        }
-        
-        .nav {
-            flex-direction: column;
-            width: 100%;
-        }
-        
-        .filter-form {
-            flex-direction: column;
-        }
-        
-        .filter-form .form-group {
-            width: 100%;
-        }
-    }
-</style>
-'''
-
 # ============== HTML SHABLONLARI ==============
 BASE_TEMPLATE = '''
 <!DOCTYPE html>
@@ -706,7 +746,7 @@ BASE_TEMPLATE = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{{ title }} - CRM Tizimi</title>
-    ''' + CSS_STYLES + '''
+    <link rel="stylesheet" href="{{ url_for('static', filename='app.css', v=STATIC_VERSION) }}">
 </head>
 <body>
     <div class="container">
@@ -717,13 +757,15 @@ BASE_TEMPLATE = '''
                 {% endfor %}
             {% endif %}
         {% endwith %}
-        {{ content|safe }}
+        {% block content %}{% endblock %}
     </div>
 </body>
 </html>
 '''
 
 LOGIN_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="login-container">
     <div class="card">
         <div class="login-logo">
@@ -743,9 +785,12 @@ LOGIN_TEMPLATE = '''
         </form>
     </div>
 </div>
+{% endblock %}
 '''
 
 DASHBOARD_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>📊 CRM Tizimi</h1>
@@ -796,9 +841,12 @@ DASHBOARD_TEMPLATE = '''
         <p>Muddati o'tgan</p>
     </div>
 </div>
+{% endblock %}
 '''
 
 CHANGE_PROFILE_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>⚙️ Profil o'zgartirish</h1>
@@ -827,9 +875,12 @@ CHANGE_PROFILE_TEMPLATE = '''
         <button type="submit" class="btn btn-primary">💾 Saqlash</button>
     </form>
 </div>
+{% endblock %}
 '''
 
 TELEGRAM_SETTINGS_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>🤖 Telegram sozlamalari</h1>
@@ -848,9 +899,12 @@ TELEGRAM_SETTINGS_TEMPLATE = '''
         <button type="submit" class="btn btn-primary">💾 Saqlash</button>
     </form>
 </div>
+{% endblock %}
 '''
 
 XODIMLAR_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>👥 Xodimlar boshqaruvi</h1>
@@ -913,9 +967,12 @@ XODIMLAR_TEMPLATE = '''
         </table>
     </div>
 </div>
+{% endblock %}
 '''
 
 EDIT_XODIM_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>✏️ Xodimni o'zgartirish</h1>
@@ -942,9 +999,12 @@ EDIT_XODIM_TEMPLATE = '''
         <button type="submit" class="btn btn-primary">💾 Saqlash</button>
     </form>
 </div>
+{% endblock %}
 '''
 
 EDIT_TASK_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>✏️ Topshiriqni o'zgartirish</h1>
@@ -982,9 +1042,12 @@ EDIT_TASK_TEMPLATE = '''
         <button type="submit" class="btn btn-primary">💾 Saqlash</button>
     </form>
 </div>
+{% endblock %}
 '''
 
 ADD_TASK_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>➕ Yangi topshiriq</h1>
@@ -1022,9 +1085,12 @@ ADD_TASK_TEMPLATE = '''
         <button type="submit" class="btn btn-primary">💾 Saqlash</button>
     </form>
 </div>
+{% endblock %}
 '''
 
 ALL_TASKS_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>📋 Barcha topshiriqlar</h1>
@@ -1044,9 +1110,7 @@ ALL_TASKS_TEMPLATE = '''
             <label>Xodim</label>
             <select name="xodim" class="form-control">
                 <option value="">Barchasi</option>
-                {% for user in users %}
-                    <option value="{{ user.id }}" {{ 'selected' if request.args.get('xodim')|int == user.id }}>{{ user.full_name or user.username }}</option>
-                {% endfor %}
+                {{ user_options }}
             </select>
         </div>
         <button type="submit" class="btn btn-primary">🔍 Filtr</button>
@@ -1066,6 +1130,9 @@ ALL_TASKS_TEMPLATE = '''
                 </tr>
             </thead>
             <tbody>
+                {# url_for sahifada bir marta: har qatorda faqat id qo'shiladi #}
+                {% set delete_base = url_for('delete_task', id=0).rsplit('/', 1)[0] %}
+                {% set edit_base = url_for('edit_task', id=0).rsplit('/', 1)[0] %}
                 {% for task in tasks %}
                 <tr>
                     <td>{{ task.id }}</td>
@@ -1082,7 +1149,7 @@ ALL_TASKS_TEMPLATE = '''
                     <td>
                         {% if task.deadline %}
                             {{ task.deadline.strftime('%d.%m.%Y %H:%M') }}
-                            {% if task.status == 'pending' and is_overdue(task.deadline) %}
+                            {% if task.is_overdue_flag %}
                                 <span class="badge badge-overdue">Muddati o'tgan!</span>
                             {% endif %}
                         {% else %}
@@ -1098,10 +1165,10 @@ ALL_TASKS_TEMPLATE = '''
                     </td>
                     <td>{{ task.created_at.strftime('%d.%m.%Y') if task.created_at else '-' }}</td>
                     <td>
-                        <form method="POST" action="{{ url_for('delete_task', id=task.id) }}" style="display:inline; margin-right:6px;">
+                        <form method="POST" action="{{ delete_base }}/{{ task.id }}" style="display:inline; margin-right:6px;">
                             <button type="submit" class="btn btn-danger btn-sm" onclick="return confirm('Rostdan o\\'chirmoqchimisiz?')">🗑 O'chirish</button>
                         </form>
-                        <a href="{{ url_for('edit_task', id=task.id) }}" class="btn btn-primary btn-sm">✏️ O'zgartirish</a>
+                        <a href="{{ edit_base }}/{{ task.id }}" class="btn btn-primary btn-sm">✏️ O'zgartirish</a>
                     </td>
                 </tr>
                 {% endfor %}
@@ -1109,9 +1176,12 @@ ALL_TASKS_TEMPLATE = '''
         </table>
     </div>
 </div>
+{% endblock %}
 '''
 
 MY_TASKS_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
 <div class="card">
     <div class="card-header">
         <h1>📝 Mening topshiriqlarim</h1>
@@ -1145,7 +1215,7 @@ MY_TASKS_TEMPLATE = '''
                     <td>
                         {% if task.deadline %}
                             {{ task.deadline.strftime('%d.%m.%Y %H:%M') }}
-                            {% if task.status == 'pending' and is_overdue(task.deadline) %}
+                            {% if task.is_overdue_flag %}
                                 <span class="badge badge-overdue">Muddati o'tgan!</span>
                             {% endif %}
                         {% else %}
@@ -1207,8 +1277,69 @@ document.getElementById('completeModal').addEventListener('click', function(e) {
     if (e.target === this) hideCompleteModal();
 });
 </script>
+{% endblock %}
 '''
 
+# Shablonlar nomi bo'yicha (DictLoader) yuklanadi va import vaqtida bir marta
+# kompilyatsiya qilinadi; Flask globallari (url_for, request, session) ishlayveradi.
+# Sahifalar base.html ni {% extends %} qiladi: har so'rovda bitta render.
+TEMPLATES = {
+    'base.html': BASE_TEMPLATE,
+    'login.html': LOGIN_TEMPLATE,
+    'dashboard.html': DASHBOARD_TEMPLATE,
+    'change_profile.html': CHANGE_PROFILE_TEMPLATE,
+    'telegram_settings.html': TELEGRAM_SETTINGS_TEMPLATE,
+    'xodimlar.html': XODIMLAR_TEMPLATE,
+    'edit_xodim.html': EDIT_XODIM_TEMPLATE,
+    'edit_task.html': EDIT_TASK_TEMPLATE,
+    'add_task.html': ADD_TASK_TEMPLATE,
+    'all_tasks.html': ALL_TASKS_TEMPLATE,
+    'my_tasks.html': MY_TASKS_TEMPLATE,
+}
+app.jinja_loader = DictLoader(TEMPLATES)
+COMPILED = {name.removesuffix('.html'): app.jinja_env.get_template(name) for name in TEMPLATES}
+# Shablonlar yoki app.css o'zgarsa (yangi deploy) eski ETag'lar ham yaroqsiz bo'ladi:
+# aks holda 304 eski ?v= CSS manziliga ishora qilayotgan sahifani qoldiradi
+PAGES_VERSION = hashlib.sha256(
+    (''.join(TEMPLATES.values()) + app.jinja_env.globals['STATIC_VERSION']).encode()
+).hexdigest()[:12]
+
+def task_list_etag(where='', params=()):
+    """Topshiriqlar ro'yxati uchun ETag (bitta yengil SELECT, render qilinmaydi).
+
+    Flash xabari kutilayotgan bo'lsa None: u sahifa keshlanmasligi kerak.
+    """
+    if '_flashes' in session:
+        return None
+    # COUNT/MAX qo'shish, o'chirish va bajarishni, data_version esa
+    # tahrirlarni ushlaydi; overdue vaqt o'tishi bilan chiqadigan belgini
+    row = get_reader().execute(f'''
+        SELECT (SELECT value FROM settings WHERE key = 'data_version') AS version,
+               COUNT(*) AS cnt,
+               MAX(COALESCE(t.completed_at, t.created_at)) AS last_change,
+               SUM(t.status = 'pending' AND t.deadline < ?) AS overdue
+        FROM tasks t {where}
+    ''', (_uzb_now_pair()[1], *params)).fetchone()
+    # query_string: har bir filtr (status, xodim) o'z ETag'iga ega
+    raw = '|'.join(str(part) for part in (
+        PAGES_VERSION, request.query_string.decode('latin-1'), session.get('user_id'), session.get('username'), session.get('full_name'),
+        row['version'], row['cnt'], row['last_change'], row['overdue'],
+    ))
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+def conditional_page(etag, render):
+    """If-None-Match mos kelsa 304, aks holda render() natijasi ETag bilan"""
+    # If-None-Match zaif taqqoslanadi (RFC 7232): proxy W/"..." qilgan teg ham mos keladi
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(render())
+    if etag is not None:
+        response.set_etag(etag)
+        # Brauzer har safar tekshiradi, umumiy proxy'lar saqlamaydi
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 # ============== ROUTELAR ==============
 @app.route('/')
 def index():
@@ -1226,16 +1357,19 @@ def login():
             flash('Login va parol kiritilishi shart!', 'error')
             return redirect(url_for('login'))
         
-        hashed = hashlib.sha256(password.encode()).hexdigest()
-        
-        conn = get_db()
+        conn = get_reader()
+        # Faqat sessiya uchun kerakli ustunlar; parol tuzli bo'lgani uchun
+        # SQL da emas, verify_password() da tekshiriladi
         user = conn.execute(
-            'SELECT * FROM users WHERE username = ? AND password = ?',
-            (username, hashed)
+            'SELECT id, username, role, full_name, password FROM users WHERE username = ?', (username,)
         ).fetchone()
-        conn.close()
         
-        if user:
+        if user and verify_password(user['password'], password):
+            if is_legacy_hash(user['password']):
+                # scrypt yozish lock'idan tashqarida hisoblanadi
+                new_hash = hash_password(password)
+                with get_writer() as writer:
+                    writer.execute('UPDATE users SET password = ? WHERE id = ?', (new_hash, user['id']))
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['role'] = user['role']
@@ -1245,7 +1379,7 @@ def login():
         else:
             flash('Noto\'g\'ri login yoki parol!', 'error')
     
-    return render_template_string(BASE_TEMPLATE, title='Kirish', content=LOGIN_TEMPLATE)
+    return COMPILED['login'].render(title='Kirish')
 
 @app.route('/logout')
 def logout():
@@ -1256,37 +1390,14 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    conn = get_db()
-    now = get_uzb_now()
-    
-    # Statistika
-    if session['role'] == 'boss':
-        total = conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
-        completed = conn.execute('SELECT COUNT(*) FROM tasks WHERE status = "completed"').fetchone()[0]
-        pending = conn.execute('SELECT COUNT(*) FROM tasks WHERE status = "pending"').fetchone()[0]
-        overdue = conn.execute(
-            'SELECT COUNT(*) FROM tasks WHERE status = "pending" AND deadline < ?',
-            (now,)
-        ).fetchone()[0]
-    else:
-        total = conn.execute('SELECT COUNT(*) FROM tasks WHERE assigned_to = ?', (session['user_id'],)).fetchone()[0]
-        completed = conn.execute('SELECT COUNT(*) FROM tasks WHERE assigned_to = ? AND status = "completed"', (session['user_id'],)).fetchone()[0]
-        pending = conn.execute('SELECT COUNT(*) FROM tasks WHERE assigned_to = ? AND status = "pending"', (session['user_id'],)).fetchone()[0]
-        overdue = conn.execute(
-            'SELECT COUNT(*) FROM tasks WHERE assigned_to = ? AND status = "pending" AND deadline < ?',
-            (session['user_id'], now)
-        ).fetchone()[0]
-    
-    conn.close()
-    
-    stats = {'total': total, 'completed': completed, 'pending': pending, 'overdue': overdue}
+    # Boss barcha topshiriqlarni, xodim faqat o'zinikini ko'radi
+    stats = get_dashboard_stats(None if session['role'] == 'boss' else session['user_id'])
     
-    return render_template_string(BASE_TEMPLATE, title='Dashboard', content=render_template_string(DASHBOARD_TEMPLATE, stats=stats, session=session))
+    return COMPILED['dashboard'].render(title='Dashboard', stats=stats)
 
 @app.route('/xodimlar', methods=['GET', 'POST'])
 @boss_required
 def xodimlar():
-    conn = get_db()
     
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
@@ -1297,29 +1408,28 @@ def xodimlar():
         if not username or not password:
             flash('Login va parol kiritilishi shart!', 'error')
         else:
-            hashed = hashlib.sha256(password.encode()).hexdigest()
+            hashed = hash_password(password)
             try:
-                conn.execute(
-                    'INSERT INTO users (username, password, role, full_name, telegram_chat_id) VALUES (?, ?, ?, ?, ?)',
-                    (username, hashed, 'xodim', full_name or None, telegram_chat_id or None)
-                )
-                conn.commit()
+                with get_writer() as conn:
+                    conn.execute(
+                        'INSERT INTO users (username, password, role, full_name, telegram_chat_id) VALUES (?, ?, ?, ?, ?)',
+                        (username, hashed, 'xodim', full_name or None, telegram_chat_id or None)
+                    )
+                    bump_data_version(conn)
                 flash(f'Xodim "{username}" qo\'shildi!', 'success')
             except sqlite3.IntegrityError:
                 flash('Bu login allaqachon mavjud!', 'error')
     
-    xodimlar = conn.execute('SELECT * FROM users WHERE role = "xodim" ORDER BY id DESC').fetchall()
-    conn.close()
+    xodimlar = get_reader().execute('SELECT * FROM users WHERE role = "xodim" ORDER BY id DESC').fetchall()
     
-    return render_template_string(BASE_TEMPLATE, title='Xodimlar', content=render_template_string(XODIMLAR_TEMPLATE, xodimlar=xodimlar))
+    return COMPILED['xodimlar'].render(title='Xodimlar', xodimlar=xodimlar)
 
 @app.route('/delete_xodim/<int:id>', methods=['POST'])
 @boss_required
 def delete_xodim(id):
-    conn = get_db()
-    conn.execute('DELETE FROM users WHERE id = ? AND role = "xodim"', (id,))
-    conn.commit()
-    conn.close()
+    with get_writer() as conn:
+        conn.execute('DELETE FROM users WHERE id = ? AND role = "xodim"', (id,))
+        bump_data_version(conn)
     flash('Xodim o\'chirildi!', 'success')
     return redirect(url_for('xodimlar'))
 
@@ -1327,10 +1437,10 @@ def delete_xodim(id):
 @app.route('/delete_task/<int:id>', methods=['POST'])
 @boss_required
 def delete_task(id):
-    conn = get_db()
-    conn.execute('DELETE FROM tasks WHERE id = ?', (id,))
-    conn.commit()
-    conn.close()
+    with get_writer() as conn:
+        conn.execute('DELETE FROM tasks WHERE id = ?', (id,))
+        bump_data_version(conn)
+    invalidate_dashboard_cache()
     flash('Topshiriq o\'chirildi!', 'success')
     return redirect(url_for('all_tasks'))
 
@@ -1338,10 +1448,9 @@ def delete_task(id):
 @app.route('/edit_xodim/<int:id>', methods=['GET', 'POST'])
 @boss_required
 def edit_xodim(id):
-    conn = get_db()
+    conn = get_reader()
     user = conn.execute('SELECT * FROM users WHERE id = ? AND role = "xodim"', (id,)).fetchone()
     if not user:
-        conn.close()
         flash('Xodim topilmadi!', 'error')
         return redirect(url_for('xodimlar'))
 
@@ -1353,7 +1462,6 @@ def edit_xodim(id):
 
         if not username:
             flash('Username bo\'sh bo\'lmasligi kerak!', 'error')
-            conn.close()
             return redirect(url_for('edit_xodim', id=id))
 
         # Username uniqueness
@@ -1361,7 +1469,6 @@ def edit_xodim(id):
             existing = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
             if existing:
                 flash('Bu username allaqachon mavjud!', 'error')
-                conn.close()
                 return redirect(url_for('edit_xodim', id=id))
 
         try:
@@ -1372,7 +1479,7 @@ def edit_xodim(id):
 
             if password:
                 updates.append('password = ?')
-                params.append(hashlib.sha256(password.encode()).hexdigest())
+                params.append(hash_password(password))
 
             updates.append('full_name = ?')
             params.append(full_name or None)
@@ -1381,23 +1488,20 @@ def edit_xodim(id):
 
             params.append(id)
             query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
-            conn.execute(query, params)
-            conn.commit()
+            with get_writer() as writer:
+                writer.execute(query, params)
+                bump_data_version(writer)
             flash('Xodim muvaffaqiyatli yangilandi!', 'success')
         except Exception as e:
             flash(f'Xatolik: {str(e)}', 'error')
-        finally:
-            conn.close()
 
         return redirect(url_for('xodimlar'))
 
-    conn.close()
-    return render_template_string(BASE_TEMPLATE, title='Xodimni o\'zgartirish', content=render_template_string(EDIT_XODIM_TEMPLATE, user=user))
+    return COMPILED['edit_xodim'].render(title='Xodimni o\'zgartirish', user=user)
 
 @app.route('/add_task', methods=['GET', 'POST'])
 @boss_required
 def add_task():
-    conn = get_db()
     
     if request.method == 'POST':
         title = request.form.get('title', '').strip()
@@ -1421,11 +1525,14 @@ def add_task():
             flash('Topshiriq nomi va xodim tanlanishi shart!', 'error')
         else:
             try:
-                cursor = conn.execute(
-                    'INSERT INTO tasks (title, description, assigned_to, deadline) VALUES (?, ?, ?, ?)',
-                    (title, description or None, int(assigned_to), deadline)
-                )
-                conn.commit()
+                with get_writer() as conn:
+                    cursor = conn.execute(
+                        'INSERT INTO tasks (title, description, assigned_to, deadline) VALUES (?, ?, ?, ?)',
+                        (title, description or None, int(assigned_to), deadline)
+                    )
+                    bump_data_version(conn)
+                invalidate_dashboard_cache()
+                schedule_reminders(cursor.lastrowid, deadline)
                 
                 # Telegram xabar yuborish
                 notify_user_new_task(int(assigned_to), title, deadline)
@@ -1436,19 +1543,21 @@ def add_task():
                 flash(f'Xatolik: {str(e)}', 'error')
     
     # Barcha foydalanuvchilar (boss ham, xodim ham)
-    users = conn.execute('SELECT * FROM users ORDER BY role DESC, full_name').fetchall()
-    conn.close()
+    users = get_users_cached()
     
-    return render_template_string(BASE_TEMPLATE, title='Topshiriq qo\'shish', content=render_template_string(ADD_TASK_TEMPLATE, users=users))
+    return COMPILED['add_task'].render(title='Topshiriq qo\'shish', users=users)
 
 
 @app.route('/edit_task/<int:id>', methods=['GET', 'POST'])
 @boss_required
 def edit_task(id):
-    conn = get_db()
-    task = conn.execute('SELECT * FROM tasks WHERE id = ?', (id,)).fetchone()
+    conn = get_reader()
+    task = conn.execute('''
+        SELECT title, description, assigned_to, deadline,
+               reminder_2h_sent, reminder_30m_sent, reminder_5m_sent
+        FROM tasks WHERE id = ?
+    ''', (id,)).fetchone()
     if not task:
-        conn.close()
         flash('Topshiriq topilmadi!', 'error')
         return redirect(url_for('all_tasks'))
 
@@ -1471,20 +1580,20 @@ def edit_task(id):
 
         if not title or not assigned_to:
             flash('Topshiriq nomi va xodim tanlanishi shart!', 'error')
-            conn.close()
             return redirect(url_for('edit_task', id=id))
 
         try:
-            conn.execute(
-                'UPDATE tasks SET title = ?, description = ?, assigned_to = ?, deadline = ? WHERE id = ?',
-                (title, description or None, int(assigned_to), deadline, id)
-            )
-            conn.commit()
+            with get_writer() as writer:
+                writer.execute(
+                    'UPDATE tasks SET title = ?, description = ?, assigned_to = ?, deadline = ? WHERE id = ?',
+                    (title, description or None, int(assigned_to), deadline, id)
+                )
+                bump_data_version(writer)
+            invalidate_dashboard_cache()
+            schedule_reminders(id, deadline, {column for _, column, _, _ in REMINDER_KINDS if task[column]})
             flash('Topshiriq muvaffaqiyatli yangilandi!', 'success')
         except Exception as e:
             flash(f'Xatolik: {str(e)}', 'error')
-        finally:
-            conn.close()
 
         return redirect(url_for('all_tasks'))
 
@@ -1499,54 +1608,64 @@ def edit_task(id):
             deadline_date = ''
             deadline_time = ''
 
-    conn2 = get_db()
-    users = conn2.execute('SELECT * FROM users ORDER BY role DESC, full_name').fetchall()
-    conn2.close()
+    users = get_users_cached()
 
-    return render_template_string(BASE_TEMPLATE, title='Topshiriqni o\'zgartirish', content=render_template_string(EDIT_TASK_TEMPLATE, task=task, users=users, deadline_date=deadline_date, deadline_time=deadline_time))
+    return COMPILED['edit_task'].render(title='Topshiriqni o\'zgartirish', task=task, users=users, deadline_date=deadline_date, deadline_time=deadline_time)
 
 @app.route('/all_tasks')
 @boss_required
 def all_tasks():
-    conn = get_db()
+    conn = get_reader()
     
-    query = '''
-        SELECT t.*, u.full_name as xodim_name 
-        FROM tasks t 
-        LEFT JOIN users u ON t.assigned_to = u.id 
-        WHERE 1=1
-    '''
+    filters = ''
     params = []
     
     status = request.args.get('status')
     if status:
-        query += ' AND t.status = ?'
+        filters += ' AND t.status = ?'
         params.append(status)
     
     xodim_id = request.args.get('xodim')
     if xodim_id:
-        query += ' AND t.assigned_to = ?'
+        filters += ' AND t.assigned_to = ?'
         params.append(int(xodim_id))
     
-    query += ' ORDER BY t.id DESC'
-    
-    tasks = conn.execute(query, params).fetchall()
-    users = conn.execute('SELECT * FROM users ORDER BY role DESC, full_name').fetchall()
-    conn.close()
-    
-    return render_template_string(BASE_TEMPLATE, title='Barcha topshiriqlar', content=render_template_string(ALL_TASKS_TEMPLATE, tasks=tasks, users=users, is_overdue=is_overdue, request=request))
+    def render():
+        # Muddat o'tganligi SQL da hisoblanadi: shablonda har qatorga Python chaqiruvi yo'q
+        # dict: shablondagi har bir task.x sqlite3.Row nomli qidiruvidan arzonroq
+        tasks = [dict(row) for row in conn.execute('''
+            SELECT t.id, t.title, t.description, t.deadline, t.status, t.completion_note,
+                   t.created_at, u.full_name as xodim_name,
+                   (t.status = 'pending' AND t.deadline IS NOT NULL AND t.deadline < ?) AS is_overdue_flag
+            FROM tasks t 
+            LEFT JOIN users u ON t.assigned_to = u.id 
+            WHERE 1=1''' + filters + ' ORDER BY t.id DESC', [_uzb_now_pair()[1], *params])]
+        # Filtr ro'yxati Python'da bitta satr qilib yig'iladi (Jinja sikli o'rniga).
+        # Foydalanuvchilar keshdan emas, bazadan: worker keshi boshqa workerdagi
+        # o'zgarishni bilmaydi, ETag esa bazadagi data_version'ga bog'langan
+        selected = request.args.get('xodim', type=int)
+        users = conn.execute('SELECT id, username, full_name FROM users ORDER BY role DESC, full_name')
+        user_options = Markup(''.join(
+            f'<option value="{u["id"]}"{" selected" if u["id"] == selected else ""}>'
+            f'{escape(u["full_name"] or u["username"])}</option>'
+            for u in users
+        ))
+        return COMPILED['all_tasks'].render(title='Barcha topshiriqlar', tasks=tasks, user_options=user_options)
+    
+    return conditional_page(task_list_etag('WHERE 1=1' + filters, params), render)
 
 @app.route('/my_tasks')
 @login_required
 def my_tasks():
-    conn = get_db()
-    tasks = conn.execute(
-        'SELECT * FROM tasks WHERE assigned_to = ? ORDER BY id DESC',
-        (session['user_id'],)
-    ).fetchall()
-    conn.close()
+    def render():
+        tasks = [dict(row) for row in get_reader().execute('''
+            SELECT id, title, description, deadline, status, completion_note, completed_at,
+                   (status = 'pending' AND deadline IS NOT NULL AND deadline < ?) AS is_overdue_flag
+            FROM tasks WHERE assigned_to = ? ORDER BY id DESC
+        ''', (_uzb_now_pair()[1], session['user_id']))]
+        return COMPILED['my_tasks'].render(title='Mening topshiriqlarim', tasks=tasks)
     
-    return render_template_string(BASE_TEMPLATE, title='Mening topshiriqlarim', content=render_template_string(MY_TASKS_TEMPLATE, tasks=tasks, is_overdue=is_overdue))
+    return conditional_page(task_list_etag('WHERE t.assigned_to = ?', (session['user_id'],)), render)
 
 @app.route('/complete_task/<int:id>', methods=['POST'])
 @login_required
@@ -1554,7 +1673,7 @@ def complete_task(id):
     note = request.form.get('note', '').strip()
     now = get_uzb_now()
     
-    conn = get_db()
+    conn = get_reader()
     
     # Faqat o'ziga berilgan topshiriqni yakunlay oladi
     task = conn.execute('SELECT * FROM tasks WHERE id = ? AND assigned_to = ?', (id, session['user_id'])).fetchone()
@@ -1562,18 +1681,19 @@ def complete_task(id):
     if not task:
         flash('Topshiriq topilmadi yoki sizga tegishli emas!', 'error')
     else:
-        conn.execute(
-            'UPDATE tasks SET status = ?, completion_note = ?, completed_at = ? WHERE id = ?',
-            ('completed', note or None, now, id)
-        )
-        conn.commit()
+        with get_writer() as writer:
+            writer.execute(
+                'UPDATE tasks SET status = ?, completion_note = ?, completed_at = ? WHERE id = ?',
+                ('completed', note or None, now, id)
+            )
+            bump_data_version(writer)
+        invalidate_dashboard_cache()
         
         # Bossga xabar yuborish
         notify_boss_task_completed(id)
         
         flash('Topshiriq bajarildi deb belgilandi!', 'success')
     
-    conn.close()
     return redirect(url_for('my_tasks'))
 
 @app.route('/change_profile', methods=['GET', 'POST'])
@@ -1585,14 +1705,12 @@ def change_profile():
         confirm_password = request.form.get('confirm_password', '').strip()
         current_password = request.form.get('current_password', '').strip()
         
-        conn = get_db()
+        conn = get_reader()
         user = conn.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],)).fetchone()
         
         # Hozirgi parolni tekshirish
-        hashed_current = hashlib.sha256(current_password.encode()).hexdigest()
-        if hashed_current != user['password']:
+        if not verify_password(user['password'], current_password):
             flash('Hozirgi parol noto\'g\'ri!', 'error')
-            conn.close()
             return redirect(url_for('change_profile'))
         
         # Yangi username tekshirish
@@ -1600,18 +1718,15 @@ def change_profile():
             existing = conn.execute('SELECT * FROM users WHERE username = ?', (new_username,)).fetchone()
             if existing:
                 flash('Bu username allaqachon mavjud!', 'error')
-                conn.close()
                 return redirect(url_for('change_profile'))
         
         # Yangi parolni tekshirish
         if new_password:
             if new_password != confirm_password:
                 flash('Parollar mos kelmadi!', 'error')
-                conn.close()
                 return redirect(url_for('change_profile'))
             if len(new_password) < 4:
                 flash('Parol kamida 4 ta belgidan iborat bo\'lishi kerak!', 'error')
-                conn.close()
                 return redirect(url_for('change_profile'))
         
         # O'zgartirishlarni saqlash
@@ -1626,24 +1741,23 @@ def change_profile():
             
             if new_password:
                 updates.append('password = ?')
-                params.append(hashlib.sha256(new_password.encode()).hexdigest())
+                params.append(hash_password(new_password))
             
             if updates:
                 params.append(session['user_id'])
                 query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
-                conn.execute(query, params)
-                conn.commit()
+                with get_writer() as writer:
+                    writer.execute(query, params)
+                    bump_data_version(writer)
                 flash('Profil muvaffaqiyatli o\'zgartirildi!', 'success')
             else:
                 flash('Hech narsa o\'zgartirilmadi', 'info')
         except Exception as e:
             flash(f'Xatolik: {str(e)}', 'error')
-        finally:
-            conn.close()
         
         return redirect(url_for('dashboard'))
     
-    return render_template_string(BASE_TEMPLATE, title='Profil o\'zgartirish', content=render_template_string(CHANGE_PROFILE_TEMPLATE))
+    return COMPILED['change_profile'].render(title='Profil o\'zgartirish')
 
 @app.route('/settings/telegram', methods=['GET', 'POST'])
 @boss_required
@@ -1658,44 +1772,43 @@ def settings_telegram():
 
     token = get_setting('TELEGRAM_BOT_TOKEN') or ''
     boss_id = get_setting('BOSS_TELEGRAM_CHAT_ID') or ''
-    return render_template_string(BASE_TEMPLATE, title='Telegram sozlamalari', content=render_template_string(TELEGRAM_SETTINGS_TEMPLATE, token=token, boss_id=boss_id))
+    return COMPILED['telegram_settings'].render(title='Telegram sozlamalari', token=token, boss_id=boss_id)
+
+class _Echo:
+    """csv.writer uchun fayl o'rnida: yozilgan qatorni shunchaki qaytaradi"""
+
+    def write(self, value):
+        return value
 
 @app.route('/export_csv')
 @boss_required
 def export_csv():
-    conn = get_db()
-    tasks = conn.execute('''
-        SELECT t.id, t.title, t.description, u.full_name as xodim_name, 
-               t.deadline, t.status, t.completion_note, t.completed_at, t.created_at
-        FROM tasks t 
-        LEFT JOIN users u ON t.assigned_to = u.id 
-        ORDER BY t.id DESC
-    ''').fetchall()
-    conn.close()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Sarlavhalar
-    writer.writerow(['ID', 'Topshiriq', 'Tavsif', 'Xodim', 'Muddat', 'Holat', 'Izoh', 'Bajarilgan sana', 'Yaratilgan sana'])
-    
-    for task in tasks:
-        writer.writerow([
-            task['id'],
-            task['title'],
-            task['description'] or '',
-            task['xodim_name'] or '',
-            task['deadline'].strftime('%d.%m.%Y %H:%M') if task['deadline'] else '',
-            'Bajarilgan' if task['status'] == 'completed' else 'Kutilmoqda',
-            task['completion_note'] or '',
-            task['completed_at'].strftime('%d.%m.%Y %H:%M') if task['completed_at'] else '',
-            task['created_at'].strftime('%d.%m.%Y %H:%M') if task['created_at'] else ''
-        ])
-    
-    output.seek(0)
-    
+    def generate():
+        # Qatorlar bazadan birma-bir o'qilib darhol yuboriladi (fetchall yo'q)
+        writer = csv.writer(_Echo())
+        
+        # Sarlavhalar
+        yield writer.writerow(['ID', 'Topshiriq', 'Tavsif', 'Xodim', 'Muddat', 'Holat', 'Izoh', 'Bajarilgan sana', 'Yaratilgan sana'])
+        
+        # Sanalar SQLite ichida formatlanadi, qator to'g'ridan-to'g'ri yoziladi.
+        # substr(..., 1, 19): '+05:00' qo'shimchasi bo'lsa strftime UTC ga o'girmasin
+        tasks = get_reader().execute('''
+            SELECT t.id, t.title, COALESCE(t.description, ''), COALESCE(u.full_name, ''),
+                   COALESCE(strftime('%d.%m.%Y %H:%M', substr(t.deadline, 1, 19)), ''),
+                   CASE WHEN t.status = 'completed' THEN 'Bajarilgan' ELSE 'Kutilmoqda' END,
+                   COALESCE(t.completion_note, ''),
+                   COALESCE(strftime('%d.%m.%Y %H:%M', substr(t.completed_at, 1, 19)), ''),
+                   COALESCE(strftime('%d.%m.%Y %H:%M', substr(t.created_at, 1, 19)), '')
+            FROM tasks t 
+            LEFT JOIN users u ON t.assigned_to = u.id 
+            ORDER BY t.id DESC
+        ''')
+        for task in tasks:
+            yield writer.writerow(task)
+    
+    # stream_with_context: o'quvchi ulanish generator tugaguncha pool'ga qaytmaydi
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={'Content-Disposition': 'attachment; filename=topshiriqlar.csv'}
     )
@@ -1711,8 +1824,10 @@ if __name__ == '__main__':
     print("=" * 50)
     print("CRM Tizimi ishga tushdi!")
     print("=" * 50)
-    print("Default login: boss / magistr")
-    print("Parolni o'zgartirishni unutmang!")
+    # BOSS_DEFAULT_PASSWORD berilgan bo'lsa 'magistr' ishlamaydi
+    if not BOSS_DEFAULT_PASSWORD:
+        print("Default login: boss / magistr")
+        print("Parolni o'zgartirishni unutmang!")
     print("=" * 50)
     print("\nTelegram integratsiyasi uchun:")
     print("export TELEGRAM_BOT_TOKEN='your_token'")
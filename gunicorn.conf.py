@@ -0,0 +1,43 @@
+"""
+Gunicorn sozlamalari
+====================
+Ilova asosan I/O kutadi (SQLite, Telegram HTTPS), shuning uchun har bir
+worker bir nechta thread bilan ishlaydi (gthread).
+
+Ishga tushirish:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import fcntl
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = 4
+# init_db va shablon kompilyatsiyasi master jarayonda bir marta bajariladi
+preload_app = True
+# Workerlarni vaqti-vaqti bilan qayta ishga tushirish (xotira oqishiga qarshi)
+max_requests = 10000
+max_requests_jitter = 500
+
+# Lock ushlab turgan worker uchun: fayl yopilmasligi kerak
+_reminder_lock_file = None
+
+
+def post_fork(server, worker):
+    """Reminder threadni faqat bitta workerda ishga tushirish (fayl lock orqali)"""
+    global _reminder_lock_file
+    import app
+
+    lock_file = open(app.DATABASE + '.reminder.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        # Boshqa worker allaqachon reminder threadni ishlatmoqda
+        lock_file.close()
+        return
+    _reminder_lock_file = lock_file
+    app.start_reminder_thread()
+    server.log.info("Reminder thread worker %s da ishga tushdi", worker.pid)